@@ -0,0 +1,82 @@
+// Helpers shared by the scraper and the verification script
+
+// Create a rate limiter that spaces requests to each host `intervalMs` apart
+function createHostRateLimiter(intervalMs) {
+  const nextSlotByHost = new Map();
+  
+  return async function waitForTurn(url) {
+    const host = new URL(url).hostname;
+    const now = Date.now();
+    const slot = Math.max(now, nextSlotByHost.get(host) || 0);
+    
+    // Reserve the slot before waiting so concurrent callers queue up behind it
+    nextSlotByHost.set(host, slot + intervalMs);
+    if (slot > now) {
+      await new Promise(resolve => setTimeout(resolve, slot - now));
+    }
+  };
+}
+
+// Resource types the extraction never reads; the content is all in the HTML.
+// The pages are rendered on the server, so scripts are not needed either, and
+// blocking them leaves one document request per navigation on the connection
+// the browser keeps alive for each host.
+const BLOCKED_RESOURCE_TYPES = new Set(['image', 'stylesheet', 'font', 'media', 'script']);
+
+// Abort requests for blocked resource types so a page load only fetches what we parse
+async function blockUnusedResources(page) {
+  await page.setRequestInterception(true);
+  page.on('request', request => {
+    if (BLOCKED_RESOURCE_TYPES.has(request.resourceType())) {
+      request.abort();
+    } else {
+      request.continue();
+    }
+  });
+}
+
+// Navigate to a URL once `waitForTurn`, a limiter from createHostRateLimiter,
+// allows it. The DOM is complete at DOMContentLoaded, so there is no need to
+// wait for the network to go idle.
+async function loadPage(page, url, waitForTurn) {
+  await waitForTurn(url);
+  await page.goto(url, { waitUntil: 'domcontentloaded' });
+}
+
+// Run a task in a dedicated tab, with unused resources blocked, and close the
+// tab once it is done
+async function withPage(browser, task) {
+  const page = await browser.newPage();
+  
+  try {
+    await blockUnusedResources(page);
+    return await task(page);
+  } finally {
+    await page.close();
+  }
+}
+
+// Serialize each top-level property of a plain object on its own, then assemble
+// the whole object from those pieces. The result matches
+// JSON.stringify(object, null, 2), and the pieces can be written to their own
+// files without serializing the same data twice.
+function stringifyByProperty(object) {
+  const properties = {};
+  const entries = [];
+  
+  for (const [key, value] of Object.entries(object)) {
+    const json = JSON.stringify(value, null, 2);
+    // Like JSON.stringify, leave out properties that have no JSON form
+    // (undefined, functions, symbols)
+    if (json === undefined) continue;
+    
+    properties[key] = json;
+    // Nested values sit one indentation level deeper in the combined document
+    entries.push(`  ${JSON.stringify(key)}: ${json.replace(/\n/g, '\n  ')}`);
+  }
+  
+  const json = entries.length > 0 ? `{\n${entries.join(',\n')}\n}` : '{}';
+  return { json, properties };
+}
+
+module.exports = { createHostRateLimiter, blockUnusedResources, loadPage, withPage, stringifyByProperty };
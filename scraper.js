@@ -5,6 +5,7 @@
 const puppeteer = require('puppeteer');
 const fs = require('fs/promises');
 const path = require('path');
+const { createHostRateLimiter, loadPage, withPage, stringifyByProperty } = require('./browser-utils');
 
 // Main data structure to hold all extracted content
 const trainingData = {
@@ -43,200 +44,267 @@ const pagesToScrape = [
   { key: "otherLanguageFeatures", name: "Other Language Features", url: "https://en.wikibooks.org/wiki/OpenSCAD_User_Manual/Other_Language_Features" }
 ];
 
-// Function to scrape the OpenSCAD cheat sheet
-async function scrapeCheatSheet(page) {
-  console.log("Scraping OpenSCAD cheat sheet...");
-  
-  await page.goto("https://openscad.org/cheatsheet/", { waitUntil: 'networkidle2' });
+// Matches text that consists of nothing but a MediaWiki edit link
+const EDIT_LINK_ONLY = /^\[edit( \| edit source)?\]$/;
+
+// Limits that keep concurrent scraping polite towards the documentation servers
+const PAGE_POOL_SIZE = 4; // Number of tabs scraping at the same time
+const MIN_REQUEST_INTERVAL_MS = 1000; // Minimum time between page loads on the same host
+
+// Browser profile reused across runs, which keeps Chrome's HTTP cache on disk
+const BROWSER_PROFILE_DIR = path.join(__dirname, '.browser_cache', 'scraper');
+
+const waitForHostTurn = createHostRateLimiter(MIN_REQUEST_INTERVAL_MS);
+
+// Extract cheat sheet content using the page structure.
+// Runs in the browser through page.evaluate, so it must only use the page DOM
+// and return plain data that can be sent back to Node.
+function extractCheatSheetData() {
+  // Extract content from all sections
+  const sections = document.querySelectorAll('section > section');
+  const cheatSheetCategories = {};
   
-  // Extract cheat sheet content using the page structure
-  const cheatSheetData = await page.evaluate(() => {
-    // Extract content from all sections
-    const sections = document.querySelectorAll('section > section');
-    const cheatSheetCategories = {};
+  sections.forEach(section => {
+    const title = section.querySelector('h2')?.textContent.trim() || 'Unnamed';
+    const entries = [];
     
-    sections.forEach(section => {
-      const title = section.querySelector('h2')?.textContent.trim() || 'Unnamed';
-      const entries = [];
-      
-      // Get all code blocks within this section
-      const codeBlocks = Array.from(section.querySelectorAll('code'));
-      
-      codeBlocks.forEach(code => {
-        entries.push({
-          syntax: code.textContent.trim(),
-          html: code.innerHTML.trim(), // Includes links
-          // Extract the links from the HTML to get URLs for more info
-          links: Array.from(code.querySelectorAll('a')).map(a => ({
-            text: a.textContent.trim(),
-            href: a.href
-          }))
-        });
+    // Get all code blocks within this section
+    const codeBlocks = Array.from(section.querySelectorAll('code'));
+    
+    codeBlocks.forEach(code => {
+      entries.push({
+        syntax: code.textContent.trim(),
+        // Extract the links from the HTML to get URLs for more info
+        links: Array.from(code.querySelectorAll('a')).map(a => ({
+          text: a.textContent.trim(),
+          href: a.href
+        }))
       });
-      
-      cheatSheetCategories[title] = entries;
     });
     
-    return cheatSheetCategories;
+    cheatSheetCategories[title] = entries;
   });
   
-  console.log("Cheat sheet scraped successfully!");
-  return cheatSheetData;
+  return cheatSheetCategories;
 }
 
-// Function to scrape a wiki page from the user manual with improved content extraction
-async function scrapeWikiPage(page, pageInfo) {
-  console.log(`Scraping ${pageInfo.name} page...`);
-  await page.goto(pageInfo.url, { waitUntil: 'networkidle2' });
+// Extract wiki page content with improved content extraction.
+// Runs in the browser through page.evaluate, so it must only use the page DOM
+// and return plain data that can be sent back to Node.
+function extractWikiPageData() {
+  // Module-level constants are not visible in the browser, so compile the patterns here
+  const EDIT_LINK_ONLY = /^\[edit( \| edit source)?\]$/;
+  const EDIT_LINKS = /\[edit\]|\[edit source\]|\[edit \| edit source\]/g;
   
-  // Extract page content with improved content extraction
-  const pageData = await page.evaluate(() => {
-    const data = {
-      title: document.title,
-      url: window.location.href,
-      introduction: "",
-      sections: [],
-      codeExamples: []
-    };
-    
-    // Get the main content
-    const content = document.querySelector('.mw-parser-output');
-    if (!content) return { error: "Could not find main content" };
+  const data = {
+    title: document.title,
+    url: window.location.href,
+    introduction: "",
+    sections: [],
+    codeExamples: []
+  };
+  
+  // Get the main content
+  const content = document.querySelector('.mw-parser-output');
+  if (!content) return { error: "Could not find main content" };
+  
+  // textContent walks an element's whole subtree, and the same elements are
+  // read for sections, code blocks and code example context, so compute each
+  // element's text once and reuse it
+  const textCache = new Map();
+  const textOf = element => {
+    let text = textCache.get(element);
+    if (text === undefined) {
+      text = element.textContent.trim();
+      textCache.set(element, text);
+    }
+    return text;
+  };
+  
+  // Clean section titles, keyed by their header element
+  const headerTitles = new Map();
+  
+  // Collect headers and code blocks in a single walk over the content. For each
+  // code block, remember the closest preceding header among its siblings.
+  const headers = [];
+  const allCodeBlocks = [];
+  const sectionHeaderOf = new Map();
+  const lastHeaderByParent = new Map();
+  
+  content.querySelectorAll('h1, h2, h3, h4, h5, h6, pre').forEach(element => {
+    if (element.tagName === 'PRE') {
+      allCodeBlocks.push(element);
+      sectionHeaderOf.set(element, lastHeaderByParent.get(element.parentElement));
+    } else {
+      headers.push(element);
+      lastHeaderByParent.set(element.parentElement, element);
+    }
+  });
+  
+  // Header lookups while walking siblings use this set instead of re-matching
+  // every sibling against the header selector
+  const headerSet = new Set(headers);
+  
+  // Extract the introduction
+  const introText = [];
+  let currentElement = content.firstElementChild;
+  
+  // Process elements until we hit the first section header
+  while (currentElement && !headerSet.has(currentElement)) {
+    // Skip navigation or edit elements
+    if (!currentElement.classList.contains('navbox') && 
+        !currentElement.classList.contains('vertical-navbox') && 
+        !currentElement.classList.contains('ambox') &&
+        !currentElement.classList.contains('noprint') &&
+        currentElement.tagName !== 'STYLE') {
+      
+      const text = textOf(currentElement);
+      // Skip empty or edit-only text
+      if (text && !EDIT_LINK_ONLY.test(text) && text !== '') {
+        introText.push(text);
+      }
+    }
+    currentElement = currentElement.nextElementSibling;
+    if (!currentElement) break;
+  }
+  
+  if (introText.length > 0) {
+    data.introduction = introText.join('\n\n');
+  }
+  
+  // Extract all sections with their actual content
+  const sections = [];
+  
+  headers.forEach(header => {
+    // Get clean title without edit links
+    const headline = header.querySelector('.mw-headline');
+    const title = headline ? textOf(headline) : 
+                 header.textContent.replace(EDIT_LINKS, '').trim();
+    headerTitles.set(header, title);
     
-    // Extract the introduction
-    const introText = [];
-    let currentElement = content.firstElementChild;
+    // Collect the section text in a single pass over the content up to the next
+    // header. Code blocks are collected for the whole page in codeExamples, so
+    // they are skipped here.
+    const sectionText = [];
     
-    // Process elements until we hit the first section header
-    while (currentElement && !currentElement.matches('h1, h2, h3, h4, h5, h6')) {
+    let sibling = header.nextElementSibling;
+    while (sibling && !headerSet.has(sibling)) {
       // Skip navigation or edit elements
-      if (!currentElement.classList.contains('navbox') && 
-          !currentElement.classList.contains('vertical-navbox') && 
-          !currentElement.classList.contains('ambox') &&
-          !currentElement.classList.contains('noprint') &&
-          currentElement.tagName !== 'STYLE') {
+      if (!sibling.classList.contains('navbox') && 
+          !sibling.classList.contains('vertical-navbox') && 
+          !sibling.classList.contains('ambox') &&
+          !sibling.classList.contains('noprint') &&
+          sibling.tagName !== 'STYLE' &&
+          sibling.tagName !== 'PRE') {
         
-        const text = currentElement.textContent.trim();
-        // Skip empty or edit-only text
-        if (text && !text.match(/^\[edit( \| edit source)?\]$/) && text !== '') {
-          introText.push(text);
+        const text = textOf(sibling);
+        if (text && !EDIT_LINK_ONLY.test(text) && text !== '') {
+          sectionText.push(text);
         }
       }
-      currentElement = currentElement.nextElementSibling;
-      if (!currentElement) break;
-    }
-    
-    if (introText.length > 0) {
-      data.introduction = introText.join('\n\n');
+      sibling = sibling.nextElementSibling;
     }
     
-    // Extract all sections with their actual content
-    const sections = [];
-    const headers = Array.from(content.querySelectorAll('h1, h2, h3, h4, h5, h6'));
-    
-    headers.forEach((header, index) => {
-      // Get clean title without edit links
-      const headline = header.querySelector('.mw-headline');
-      const title = headline ? headline.textContent.trim() : 
-                   header.textContent.replace(/\[edit\]|\[edit source\]|\[edit \| edit source\]/g, '').trim();
-      
-      const level = parseInt(header.tagName.substring(1));
-      const sectionContentElements = [];
-      
-      // Get all content until the next header
-      let sibling = header.nextElementSibling;
-      while (sibling && !sibling.matches('h1, h2, h3, h4, h5, h6')) {
-        // Skip navigation or edit elements
-        if (!sibling.classList.contains('navbox') && 
-            !sibling.classList.contains('vertical-navbox') && 
-            !sibling.classList.contains('ambox') &&
-            !sibling.classList.contains('noprint') &&
-            sibling.tagName !== 'STYLE') {
-          
-          // Save the element for content extraction
-          sectionContentElements.push(sibling);
-        }
-        sibling = sibling.nextElementSibling;
-        if (!sibling) break;
-      }
-      
-      // Process the content elements to extract text and code
-      const sectionText = [];
-      const sectionCodeBlocks = [];
-      
-      sectionContentElements.forEach(element => {
-        if (element.tagName === 'PRE') {
-          // Code block
-          sectionCodeBlocks.push({
-            code: element.textContent.trim(),
-            context: "Part of section: " + title
-          });
-        } else {
-          // Regular text content
-          const text = element.textContent.trim();
-          if (text && !text.match(/^\[edit( \| edit source)?\]$/) && text !== '') {
-            sectionText.push(text);
-          }
-        }
-      });
-      
-      sections.push({
-        title: title,
-        level: level,
-        content: sectionText.join('\n\n'),
-        codeBlocks: sectionCodeBlocks
-      });
+    // Only the fields processWikiPage reads are sent back to Node
+    sections.push({
+      title: title,
+      content: sectionText.join('\n\n')
     });
+  });
+  
+  data.sections = sections;
+  
+  // Improved code example extraction with better context
+  data.codeExamples = allCodeBlocks.map(pre => {
+    // Look for context in preceding elements
+    let contextElement = pre.previousElementSibling;
+    let contextText = "";
+    let contextAttempts = 0;
     
-    data.sections = sections;
-    
-    // Improved code example extraction with better context
-    const allCodeBlocks = Array.from(content.querySelectorAll('pre'));
-    data.codeExamples = allCodeBlocks.map(pre => {
-      // Look for context in preceding elements
-      let contextElement = pre.previousElementSibling;
-      let contextText = "";
-      let contextAttempts = 0;
-      
-      // Try up to 3 previous elements to find meaningful context
-      while (contextElement && contextAttempts < 3 && !contextText) {
-        if (contextElement.tagName !== 'H1' && contextElement.tagName !== 'H2' && 
-            contextElement.tagName !== 'H3' && contextElement.tagName !== 'H4' && 
-            contextElement.tagName !== 'H5' && contextElement.tagName !== 'H6') {
-          
-          const text = contextElement.textContent.trim();
-          if (text && text.length > 10 && !text.match(/^\[edit( \| edit source)?\]$/)) {
-            contextText = text;
-          }
-        }
-        contextElement = contextElement.previousElementSibling;
-        contextAttempts++;
-      }
-      
-      // If no good context found, get the section header
-      if (!contextText) {
-        let heading = pre;
-        while (heading && !heading.matches('h1, h2, h3, h4, h5, h6')) {
-          heading = heading.previousElementSibling;
-        }
+    // Try up to 3 previous elements to find meaningful context
+    while (contextElement && contextAttempts < 3 && !contextText) {
+      if (contextElement.tagName !== 'H1' && contextElement.tagName !== 'H2' && 
+          contextElement.tagName !== 'H3' && contextElement.tagName !== 'H4' && 
+          contextElement.tagName !== 'H5' && contextElement.tagName !== 'H6') {
         
-        if (heading) {
-          const headline = heading.querySelector('.mw-headline');
-          contextText = "Part of section: " + (headline ? 
-                       headline.textContent.trim() : 
-                       heading.textContent.replace(/\[edit\]|\[edit source\]|\[edit \| edit source\]/g, '').trim());
+        const text = textOf(contextElement);
+        if (text && text.length > 10 && !EDIT_LINK_ONLY.test(text)) {
+          contextText = text;
         }
       }
-      
-      return {
-        code: pre.textContent.trim(),
-        context: contextText || "No specific context available"
-      };
-    });
+      contextElement = contextElement.previousElementSibling;
+      contextAttempts++;
+    }
+    
+    // If no good context found, get the section header
+    if (!contextText) {
+      const heading = sectionHeaderOf.get(pre);
+      if (heading) {
+        contextText = "Part of section: " + headerTitles.get(heading);
+      }
+    }
     
-    return data;
+    return {
+      code: textOf(pre),
+      context: contextText || "No specific context available"
+    };
   });
   
+  return data;
+}
+
+// Cheat sheet sections to keep: the category each is stored under in
+// trainingData.cheatSheet and the description given to its entries
+const CHEAT_SHEET_SECTIONS = [
+  { section: "Syntax", category: "syntax", description: "Syntax element" },
+  { section: "2D", category: "primitives2D", description: "2D primitive" },
+  { section: "3D", category: "primitives3D", description: "3D primitive" },
+  { section: "Transformations", category: "transformations", description: "Transformation" }
+];
+
+// Schema of a cheat sheet entry in the training data. Building every entry
+// (and every manual page below) in one place gives them all the same shape.
+function createCheatSheetEntry(entry, description) {
+  return {
+    name: entry.syntax,
+    description: description,
+    links: entry.links
+  };
+}
+
+// Schema of a user manual page in the training data; content is filled in
+// per section afterwards
+function createManualPage(pageInfo, pageData) {
+  return {
+    title: pageInfo.name,
+    url: pageInfo.url,
+    introduction: pageData.introduction,
+    content: {},
+    codeExamples: pageData.codeExamples
+  };
+}
+
+// Function to scrape the OpenSCAD cheat sheet
+async function scrapeCheatSheet(page) {
+  console.log("Scraping OpenSCAD cheat sheet...");
+  
+  await loadPage(page, "https://openscad.org/cheatsheet/", waitForHostTurn);
+  
+  // Extract cheat sheet content inside the tab's renderer process
+  const cheatSheetData = await page.evaluate(extractCheatSheetData);
+  
+  console.log("Cheat sheet scraped successfully!");
+  return cheatSheetData;
+}
+
+// Function to scrape a wiki page from the user manual with improved content extraction
+async function scrapeWikiPage(page, pageInfo) {
+  console.log(`Scraping ${pageInfo.name} page...`);
+  await loadPage(page, pageInfo.url, waitForHostTurn);
+  
+  // Extract page content inside the tab's renderer process
+  const pageData = await page.evaluate(extractWikiPageData);
+  
   console.log(`${pageInfo.name} page scraped successfully!`);
   return pageData;
 }
@@ -244,60 +312,30 @@ async function scrapeWikiPage(page, pageInfo) {
 // Process the cheat sheet data and organize it into categories
 function processCheatSheetData(cheatSheetData) {
   // Map the raw sections to our structured format
-  if (cheatSheetData.Syntax) {
-    trainingData.cheatSheet.syntax = cheatSheetData.Syntax.map(entry => ({
-      name: entry.syntax,
-      description: "Syntax element",
-      links: entry.links
-    }));
-  }
-  
-  // Map other categories accordingly
-  if (cheatSheetData["2D"]) {
-    trainingData.cheatSheet.primitives2D = cheatSheetData["2D"].map(entry => ({
-      name: entry.syntax,
-      description: "2D primitive",
-      links: entry.links
-    }));
-  }
-  
-  if (cheatSheetData["3D"]) {
-    trainingData.cheatSheet.primitives3D = cheatSheetData["3D"].map(entry => ({
-      name: entry.syntax,
-      description: "3D primitive",
-      links: entry.links
-    }));
-  }
-  
-  if (cheatSheetData.Transformations) {
-    trainingData.cheatSheet.transformations = cheatSheetData.Transformations.map(entry => ({
-      name: entry.syntax,
-      description: "Transformation",
-      links: entry.links
-    }));
-  }
+  CHEAT_SHEET_SECTIONS.forEach(({ section, category, description }) => {
+    if (cheatSheetData[section]) {
+      trainingData.cheatSheet[category] = cheatSheetData[section].map(entry =>
+        createCheatSheetEntry(entry, description)
+      );
+    }
+  });
   
-  // Add other categories based on what's available in the cheat sheet
+  // Add other categories to CHEAT_SHEET_SECTIONS based on what's available in the cheat sheet
   console.log("Cheat sheet data processed and categorized.");
 }
 
 // Process the page data from the wiki
 function processWikiPage(pageInfo, pageData) {
   // Add the page to our structured data
-  trainingData.userManual[pageInfo.key] = {
-    title: pageInfo.name,
-    url: pageInfo.url,
-    introduction: pageData.introduction,
-    content: {},
-    codeExamples: pageData.codeExamples
-  };
+  const manualPage = createManualPage(pageInfo, pageData);
+  trainingData.userManual[pageInfo.key] = manualPage;
   
   // Convert the sections array to a structured object
   pageData.sections.forEach(section => {
     if (section.title && section.title.trim() !== '' && section.content) {
       // Make sure we're not storing empty content or just edit links
-      if (!section.content.match(/^\[edit( \| edit source)?\]$/)) {
-        trainingData.userManual[pageInfo.key].content[section.title] = section.content;
+      if (!EDIT_LINK_ONLY.test(section.content)) {
+        manualPage.content[section.title] = section.content;
       }
     }
   });
@@ -305,28 +343,51 @@ function processWikiPage(pageInfo, pageData) {
   console.log(`${pageInfo.name} data processed and added to the training data.`);
 }
 
+// Work through a queue of scraping tasks with a fixed pool of tabs. Each worker
+// reuses its tab for every task it takes, the pool finishes once the queue is
+// drained, and the results come back in task order.
+async function runOnPagePool(browser, tasks, poolSize) {
+  const results = new Array(tasks.length);
+  let nextTask = 0;
+  
+  const worker = () => withPage(browser, async page => {
+    while (nextTask < tasks.length) {
+      const index = nextTask++;
+      results[index] = await tasks[index](page);
+    }
+  });
+  
+  const workerCount = Math.min(poolSize, tasks.length);
+  await Promise.all(Array.from({ length: workerCount }, worker));
+  return results;
+}
+
 // Main function to run the entire scraping process
 async function runScraper() {
   const browser = await puppeteer.launch({ 
     headless: true,
+    // Keep the browser profile between runs so its HTTP cache survives. Pages
+    // fetched before are then revalidated with If-None-Match/If-Modified-Since,
+    // and unchanged ones come back as 304 without a body.
+    userDataDir: BROWSER_PROFILE_DIR,
     args: ['--no-sandbox', '--disable-setuid-sandbox']
   });
   
   try {
-    const page = await browser.newPage();
+    // Step 1 & 2: Scrape the cheat sheet and each wiki page concurrently on a
+    // pool of tabs, so page loads overlap instead of queueing. The host rate
+    // limit keeps it polite.
+    const [cheatSheetData, ...wikiPagesData] = await runOnPagePool(browser, [
+      page => scrapeCheatSheet(page),
+      ...pagesToScrape.map(pageInfo => page => scrapeWikiPage(page, pageInfo))
+    ], PAGE_POOL_SIZE);
     
-    // Step 1: Scrape the cheat sheet
-    const cheatSheetData = await scrapeCheatSheet(page);
     processCheatSheetData(cheatSheetData);
     
-    // Step 2: Scrape each wiki page
-    for (const pageInfo of pagesToScrape) {
-      const pageData = await scrapeWikiPage(page, pageInfo);
-      processWikiPage(pageInfo, pageData);
-      
-      // Optional: Add delay between requests to avoid overloading the server
-      await new Promise(resolve => setTimeout(resolve, 1000));
-    }
+    // Process the wiki pages in their original order to keep the output stable
+    pagesToScrape.forEach((pageInfo, index) => {
+      processWikiPage(pageInfo, wikiPagesData[index]);
+    });
     
     // Step 3: Save the extracted data
     await saveTrainingData();
@@ -346,25 +407,28 @@ async function saveTrainingData() {
     const outputDir = path.join(__dirname, 'output');
     await fs.mkdir(outputDir, { recursive: true });
     
-    // Save the complete dataset
-    await fs.writeFile(
-      path.join(outputDir, 'openscad_training_data.json'),
-      JSON.stringify(trainingData, null, 2),
-      'utf8'
-    );
-    
-    // Also save individual components for easier handling
-    await fs.writeFile(
-      path.join(outputDir, 'openscad_cheatsheet.json'),
-      JSON.stringify(trainingData.cheatSheet, null, 2),
-      'utf8'
-    );
+    // Serialize each component once and reuse it for the complete dataset
+    const serialized = stringifyByProperty(trainingData);
     
-    await fs.writeFile(
-      path.join(outputDir, 'openscad_usermanual.json'),
-      JSON.stringify(trainingData.userManual, null, 2),
-      'utf8'
-    );
+    // Save the complete dataset and, for easier handling, its individual
+    // components. The files are independent, so write them concurrently.
+    await Promise.all([
+      fs.writeFile(
+        path.join(outputDir, 'openscad_training_data.json'),
+        serialized.json,
+        'utf8'
+      ),
+      fs.writeFile(
+        path.join(outputDir, 'openscad_cheatsheet.json'),
+        serialized.properties.cheatSheet,
+        'utf8'
+      ),
+      fs.writeFile(
+        path.join(outputDir, 'openscad_usermanual.json'),
+        serialized.properties.userManual,
+        'utf8'
+      )
+    ]);
     
     console.log("Training data saved successfully to output directory.");
   } catch (error) {
@@ -391,7 +455,7 @@ function createTrainingExamples() {
     // Create examples from each section's content if it's substantial
     for (const subSection in sectionData.content) {
       const content = sectionData.content[subSection];
-      if (content && content.length > 50 && !content.match(/^\[edit( \| edit source)?\]$/)) {
+      if (content && content.length > 50 && !EDIT_LINK_ONLY.test(content)) {
         examples.push({
           query: `What is ${subSection} in OpenSCAD?`,
           response: content
@@ -402,7 +466,7 @@ function createTrainingExamples() {
     // Create examples from code examples with good context
     sectionData.codeExamples.forEach(example => {
       if (example.context && example.context !== "No specific context available" && 
-          !example.context.match(/^\[edit( \| edit source)?\]$/)) {
+          !EDIT_LINK_ONLY.test(example.context)) {
         examples.push({
           query: `Give me an example of ${sectionData.title.toLowerCase()} in OpenSCAD`,
           response: `Here's an example of ${sectionData.title.toLowerCase()} in OpenSCAD:\n\n\`\`\`scad\n${example.code}\n\`\`\`\n\n${example.context}`
@@ -414,8 +478,7 @@ function createTrainingExamples() {
   // Filter out examples with minimal or problematic responses
   return examples.filter(ex => 
     ex.response.length > 50 && 
-    !ex.response.includes('[edit') && 
-    !ex.response.match(/^\[edit( \| edit source)?\]$/)
+    !ex.response.includes('[edit')
   );
 }
 
@@ -4,13 +4,16 @@
 const puppeteer = require('puppeteer');
 const fs = require('fs/promises');
 const path = require('path');
+const { createHostRateLimiter, loadPage, withPage, stringifyByProperty } = require('./browser-utils');
 
 // Configuration
 const config = {
   outputDir: path.join(__dirname, 'verification_output'),
+  browserProfileDir: path.join(__dirname, '.browser_cache', 'verification'), // Keeps Chrome's HTTP cache between runs
   printVersionUrl: 'https://en.wikibooks.org/wiki/OpenSCAD_User_Manual/Print_version',
   languagePrintUrl: 'https://en.wikibooks.org/wiki/OpenSCAD_User_Manual/The_OpenSCAD_Language',
   scrapedDataPath: path.join(__dirname, 'output', 'openscad_training_data.json'),
+  requestIntervalMs: 1000, // Minimum time between page loads on the same host
   keySections: [
     { name: 'Matrix', parentSection: 'general' },
     { name: 'Objects', parentSection: 'general' },
@@ -24,6 +27,11 @@ const config = {
   ]
 };
 
+// Matches text that consists of nothing but a MediaWiki edit link
+const EDIT_LINK_ONLY = /^\[edit(\s*\|\s*edit\s+source)?\]$/;
+
+const waitForHostTurn = createHostRateLimiter(config.requestIntervalMs);
+
 // Main verification function
 async function verifyDocumentation() {
   try {
@@ -60,23 +68,25 @@ async function verifyDocumentation() {
 async function extractPrintVersionContent() {
   const browser = await puppeteer.launch({
     headless: true,
+    // Reuse the profile so unchanged pages are revalidated from the HTTP cache
+    userDataDir: config.browserProfileDir,
     args: ['--no-sandbox', '--disable-setuid-sandbox']
   });
   
   try {
-    const page = await browser.newPage();
-    
-    // Extract content from the main print version
-    console.log("Navigating to print version...");
-    await page.goto(config.printVersionUrl, { waitUntil: 'networkidle2' });
-    
-    const printContent = await extractStructuredContent(page);
-    
-    // Extract content from the language print version
-    console.log("Navigating to language print version...");
-    await page.goto(config.languagePrintUrl, { waitUntil: 'networkidle2' });
-    
-    const languagePrintContent = await extractStructuredContent(page);
+    // Extract content from both print versions concurrently, each in its own tab
+    const [printContent, languagePrintContent] = await Promise.all([
+      withPage(browser, async page => {
+        console.log("Navigating to print version...");
+        await loadPage(page, config.printVersionUrl, waitForHostTurn);
+        return extractStructuredContent(page);
+      }),
+      withPage(browser, async page => {
+        console.log("Navigating to language print version...");
+        await loadPage(page, config.languagePrintUrl, waitForHostTurn);
+        return extractStructuredContent(page);
+      })
+    ]);
     
     // Combine both sources
     return {
@@ -91,14 +101,15 @@ async function extractPrintVersionContent() {
 // Function to extract structured content from a page
 async function extractStructuredContent(page) {
   return await page.evaluate(() => {
+    // This callback runs in the browser, so it compiles its own pattern once per page.
+    // One alternation strips [edit], [edit source] and [edit | edit source] in a
+    // single scan of the text.
+    const EDIT_LINKS = /\[edit(?: source| \| edit source)?\]/g;
+    
     // Helper function to clean text
     const cleanText = (text) => {
       if (!text) return "";
-      return text
-        .replace(/\[edit\]/g, "")
-        .replace(/\[edit source\]/g, "")
-        .replace(/\[edit \| edit source\]/g, "")
-        .trim();
+      return text.replace(EDIT_LINKS, "").trim();
     };
     
     const content = document.querySelector('.mw-parser-output');
@@ -107,6 +118,22 @@ async function extractStructuredContent(page) {
     // Extract all headings and their content
     const sections = {};
     const headers = Array.from(content.querySelectorAll('h1, h2, h3, h4, h5, h6'));
+    const levels = headers.map(header => parseInt(header.tagName.substring(1)));
+    
+    // For every header, find the next header of the same or higher level in a
+    // single backward pass. The stack holds the candidates after the current
+    // header; any with a deeper level can never be the answer for an earlier one.
+    const nextHeaders = new Array(headers.length).fill(null);
+    const candidates = [];
+    for (let i = headers.length - 1; i >= 0; i--) {
+      while (candidates.length > 0 && levels[candidates[candidates.length - 1]] > levels[i]) {
+        candidates.pop();
+      }
+      if (candidates.length > 0) {
+        nextHeaders[i] = headers[candidates[candidates.length - 1]];
+      }
+      candidates.push(i);
+    }
     
     headers.forEach((header, index) => {
       // Clean the header text
@@ -115,19 +142,12 @@ async function extractStructuredContent(page) {
       // Skip empty titles
       if (!title || title.length === 0) return;
       
-      const level = parseInt(header.tagName.substring(1));
+      const level = levels[index];
       const contentText = [];
       const codeExamples = [];
       
-      // Find the next heading of the same or higher level
-      let nextHeader = null;
-      for (let i = index + 1; i < headers.length; i++) {
-        const nextLevel = parseInt(headers[i].tagName.substring(1));
-        if (nextLevel <= level) {
-          nextHeader = headers[i];
-          break;
-        }
-      }
+      // The next heading of the same or higher level
+      const nextHeader = nextHeaders[index];
       
       // Extract all content between this header and the next one
       let element = header.nextElementSibling;
@@ -291,58 +311,62 @@ function areSimilarCodeExamples(example1, example2) {
 // Function to save comparison results
 async function saveResults(comparisonResults) {
   try {
-    // Save full comparison results
-    await fs.writeFile(
+    // Save full comparison results; the write runs while the report is built
+    const resultsSaved = fs.writeFile(
       path.join(config.outputDir, 'comparison_results.json'),
       JSON.stringify(comparisonResults, null, 2),
       'utf8'
     );
     
-    // Create a human-readable report
-    let report = '# OpenSCAD Documentation Verification Report\n\n';
+    // Create a human-readable report. The parts are collected in an array and
+    // joined once, as the report embeds the full content of every finding.
+    const report = ['# OpenSCAD Documentation Verification Report\n\n'];
     
-    report += '## Missing Sections\n\n';
+    report.push('## Missing Sections\n\n');
     if (comparisonResults.missingSections.length === 0) {
-      report += 'No missing sections found.\n\n';
+      report.push('No missing sections found.\n\n');
     } else {
       comparisonResults.missingSections.forEach(section => {
-        report += `### ${section.name} (in ${section.parentSection})\n\n`;
+        report.push(`### ${section.name} (in ${section.parentSection})\n\n`);
         if (section.printContent) {
-          report += `Content from print version:\n\n\`\`\`\n${section.printContent}\n\`\`\`\n\n`;
+          report.push(`Content from print version:\n\n\`\`\`\n${section.printContent}\n\`\`\`\n\n`);
         } else {
-          report += 'No content found in print version either.\n\n';
+          report.push('No content found in print version either.\n\n');
         }
       });
     }
     
-    report += '## Incomplete Content\n\n';
+    report.push('## Incomplete Content\n\n');
     if (comparisonResults.incompleteContent.length === 0) {
-      report += 'No incomplete content found.\n\n';
+      report.push('No incomplete content found.\n\n');
     } else {
       comparisonResults.incompleteContent.forEach(section => {
-        report += `### ${section.name} (in ${section.parentSection})\n\n`;
-        report += `Scraped content (${section.scrapedLength} chars) vs Print version (${section.printLength} chars)\n\n`;
-        report += `#### Scraped Content:\n\n\`\`\`\n${section.scrapedContent}\n\`\`\`\n\n`;
-        report += `#### Print Version Content:\n\n\`\`\`\n${section.printContent}\n\`\`\`\n\n`;
+        report.push(`### ${section.name} (in ${section.parentSection})\n\n`);
+        report.push(`Scraped content (${section.scrapedLength} chars) vs Print version (${section.printLength} chars)\n\n`);
+        report.push(`#### Scraped Content:\n\n\`\`\`\n${section.scrapedContent}\n\`\`\`\n\n`);
+        report.push(`#### Print Version Content:\n\n\`\`\`\n${section.printContent}\n\`\`\`\n\n`);
       });
     }
     
-    report += '## Missing Code Examples\n\n';
+    report.push('## Missing Code Examples\n\n');
     if (comparisonResults.missingCodeExamples.length === 0) {
-      report += 'No missing code examples found.\n\n';
+      report.push('No missing code examples found.\n\n');
     } else {
       comparisonResults.missingCodeExamples.forEach(example => {
-        report += `### Example from ${example.section} (in ${example.parentSection})\n\n`;
-        report += `\`\`\`scad\n${example.code}\n\`\`\`\n\n`;
+        report.push(`### Example from ${example.section} (in ${example.parentSection})\n\n`);
+        report.push(`\`\`\`scad\n${example.code}\n\`\`\`\n\n`);
       });
     }
     
     // Save the report
-    await fs.writeFile(
-      path.join(config.outputDir, 'verification_report.md'),
-      report,
-      'utf8'
-    );
+    await Promise.all([
+      resultsSaved,
+      fs.writeFile(
+        path.join(config.outputDir, 'verification_report.md'),
+        report.join(''),
+        'utf8'
+      )
+    ]);
     
     console.log("Verification results saved to verification_output directory.");
   } catch (error) {
@@ -353,8 +377,24 @@ async function saveResults(comparisonResults) {
 // Function to generate supplementary content for missing/incomplete sections
 async function generateSupplementaryContent(comparisonResults, scrapedData) {
   try {
-    // Create a copy of the scraped data
-    const enhancedData = JSON.parse(JSON.stringify(scrapedData));
+    // Copy only what gets modified instead of deep-cloning the whole corpus: the
+    // top level, the user manual and each page that receives new content. All
+    // other pages are shared with the scraped data, which is left untouched.
+    const enhancedData = { ...scrapedData, userManual: { ...scrapedData.userManual } };
+    const copiedPages = new Set();
+    
+    const editablePage = parentSection => {
+      if (!copiedPages.has(parentSection)) {
+        const page = enhancedData.userManual[parentSection];
+        enhancedData.userManual[parentSection] = {
+          ...page,
+          content: { ...page.content },
+          codeExamples: [...page.codeExamples]
+        };
+        copiedPages.add(parentSection);
+      }
+      return enhancedData.userManual[parentSection];
+    };
     
     // Add supplementary content
     for (const parentSection in comparisonResults.supplementaryContent) {
@@ -368,10 +408,11 @@ async function generateSupplementaryContent(comparisonResults, scrapedData) {
             content: {},
             codeExamples: []
           };
+          copiedPages.add(parentSection);
         }
         
         // Add or replace the content
-        enhancedData.userManual[parentSection].content[sectionName] = content;
+        editablePage(parentSection).content[sectionName] = content;
       }
     }
     
@@ -379,36 +420,38 @@ async function generateSupplementaryContent(comparisonResults, scrapedData) {
     for (const example of comparisonResults.missingCodeExamples) {
       if (enhancedData.userManual[example.parentSection]) {
         // Add the code example with context
-        enhancedData.userManual[example.parentSection].codeExamples.push({
+        editablePage(example.parentSection).codeExamples.push({
           code: example.code,
           context: `Example from ${example.section} section (supplemented from print version)`
         });
       }
     }
     
-    // Save the enhanced data
-    await fs.writeFile(
-      path.join(config.outputDir, 'enhanced_training_data.json'),
-      JSON.stringify(enhancedData, null, 2),
-      'utf8'
-    );
-    
-    // Save the enhanced user manual separately
-    await fs.writeFile(
-      path.join(config.outputDir, 'enhanced_usermanual.json'),
-      JSON.stringify(enhancedData.userManual, null, 2),
-      'utf8'
-    );
+    // Serialize each component once and reuse it for the complete dataset
+    const serialized = stringifyByProperty(enhancedData);
     
     // Generate training examples using the enhanced data
     const examples = createTrainingExamples(enhancedData);
     
-    // Save the enhanced training examples
-    await fs.writeFile(
-      path.join(config.outputDir, 'enhanced_training_examples.json'),
-      JSON.stringify(examples, null, 2),
-      'utf8'
-    );
+    // Save the enhanced data, the enhanced user manual separately, and the
+    // enhanced training examples. The files are independent, so write them concurrently.
+    await Promise.all([
+      fs.writeFile(
+        path.join(config.outputDir, 'enhanced_training_data.json'),
+        serialized.json,
+        'utf8'
+      ),
+      fs.writeFile(
+        path.join(config.outputDir, 'enhanced_usermanual.json'),
+        serialized.properties.userManual,
+        'utf8'
+      ),
+      fs.writeFile(
+        path.join(config.outputDir, 'enhanced_training_examples.json'),
+        JSON.stringify(examples, null, 2),
+        'utf8'
+      )
+    ]);
     
     console.log("Enhanced data and training examples generated with supplementary content.");
   } catch (error) {
@@ -438,7 +481,7 @@ function createTrainingExamples(data) {
       
       // Validate content quality
       if (content && content.length > 50 && 
-          !content.match(/^\[edit(\s*\|\s*edit\s+source)?\]$/)) {
+          !EDIT_LINK_ONLY.test(content)) {
         examples.push({
           query: `What is ${subSection} in OpenSCAD?`,
           response: content
@@ -457,7 +500,7 @@ function createTrainingExamples(data) {
       // Validate example context
       if (example.code && example.context && 
           example.context.length > 10 && 
-          !example.context.match(/^\[edit(\s*\|\s*edit\s+source)?\]$/)) {
+          !EDIT_LINK_ONLY.test(example.context)) {
         
         examples.push({
           query: `Give me an example of ${sectionData.title.toLowerCase()} in OpenSCAD`,
@@ -477,8 +520,7 @@ function createTrainingExamples(data) {
   const validExamples = examples.filter(ex => 
     ex.response && 
     ex.response.length > 30 && 
-    !ex.response.includes('[edit') && 
-    !ex.response.match(/^\[edit(\s*\|\s*edit\s+source)?\]$/)
+    !ex.response.includes('[edit')
   );
   
   return validExamples;